@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 import geopandas as gpd
 import rasterio
+from shapely.geometry import box
 from exactextract import exact_extract
 
 
@@ -29,25 +30,32 @@ def exact_raster_poly_extract(
     for col in polygons.columns:
         if col == geometry_col:
             continue
-        try:
+        values = polygons[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            valid = values.notna()
             # Check if integer-only
-            if polygons[col].dropna().apply(float.is_integer).all():
-                polygons[col] = polygons[col].astype("Int64")
+            if np.all(np.mod(values[valid].to_numpy(dtype=float), 1) == 0):
+                polygons[col] = values.astype("Int64")
             else:
-                # Try numeric (floats)
-                polygons[col] = pd.to_numeric(polygons[col], errors="coerce").astype(float)
-        except (ValueError, TypeError):
-            # Fallback to string
-            polygons[col] = polygons[col].astype(str)
+                # Numeric (floats)
+                polygons[col] = values.astype(float)
+        else:
+            # Fallback to string (keeps e.g. leading zeros and booleans as they are)
+            polygons[col] = values.astype(str)
 
         # Fill any remaining NaNs and warn
         if polygons[col].isnull().any():
             print(f"Column '{col}' contained missing values; filling with {fillvalue}.")
-            polygons[col] = polygons[col].fillna(fillvalue)
+            # string columns get the fill value as string so they stay homogeneous (e.g. for parquet output)
+            col_fillvalue = fillvalue if pd.api.types.is_numeric_dtype(polygons[col]) else str(fillvalue)
+            polygons[col] = polygons[col].fillna(col_fillvalue)
 
     # read raster metadata
     with rasterio.open(raster_path) as src:
         num_bands = src.count
+        band_dtypes = src.dtypes
+        band_scales = src.scales
+        band_offsets = src.offsets
         bounds = src.bounds
         raster_crs = src.crs
 
@@ -55,11 +63,15 @@ def exact_raster_poly_extract(
 
     # ensure matching crs!
     if raster_crs != polygons.crs:
-        polygons = polygons.to_crs(src.crs)
+        polygons = polygons.to_crs(raster_crs)
         print("CRS did not match. Shapefile CRS has been reprojected.")
 
     # Crop polygon to raster extent
-    polygons = gpd.clip(polygons, bounds)
+    # Cheap bbox prefilter drops polygons outside the raster; only those crossing its edge need clipping.
+    # Polygons are then put in input file order (gpd.clip alone returns them in spatial index order).
+    candidates = polygons.cx[bounds.left:bounds.right, bounds.bottom:bounds.top]
+    inside = candidates.geometry.within(box(*bounds))
+    polygons = pd.concat([candidates[inside], gpd.clip(candidates[~inside], bounds)]).sort_index()
 
     if include_cols is None:
         include_cols = polygons.columns.tolist()
@@ -69,7 +81,9 @@ def exact_raster_poly_extract(
                              include_cols=include_cols, output="pandas", progress=progress)
 
     # Remove empty fields
-    ex_ex_df = ex_ex_df[ex_ex_df.iloc[:, len(include_cols) + 1].apply(lambda x: len(x) > 0)]
+    first_values = ex_ex_df.iloc[:, len(include_cols) + 1]
+    n_values = np.fromiter(map(len, first_values), dtype=np.int64, count=len(first_values))
+    ex_ex_df = ex_ex_df[n_values > 0]
 
     if ex_ex_df.empty:
         raise ValueError("No polygons were found in the raster extent.")
@@ -81,109 +95,104 @@ def exact_raster_poly_extract(
                      c.endswith("_coverage")]  # id of cols containing actual pixel values
 
     # Check that all bands have identical coverage (same number of pixels)
-    def _check_coverage_consistency(row):
-        """
-        Check if all coverage arrays have the same length
-
-        This is to catch a inconsistency in the exact_extract output when bands/layers have differing nodata patterns.
-        If a layer does not have as many valid (non nodata) pixels as the others, it will output fewer values leading to differing array lengths.
-        This in turn can cause issues when stacking values into a pixelwise df.
-        Would need a solution in the long term.
-
-        We are just trying to catch this before any data is misaligned unintentionally.
-        Not of importance for standard non composited multi band satellite imagery.
-        """
-        coverage_arrays = []
-        lengths = []
-        for col in fraction_cols:
-            val = row[col]
-            if isinstance(val, (list, np.ndarray)):
-                coverage_arrays.append(np.array(val))
-                lengths.append(len(val))
-            else:
-                # Single value case
-                coverage_arrays.append(np.array([val]))
-                lengths.append(1)
-
-        # Check if all arrays have the same length
-        if len(set(lengths)) != 1:
-            # Get value arrays for better error message
-            value_lengths = []
-            for col in pixelwise_cols:
-                val = row[col]
-                value_lengths.append(len(val) if hasattr(val, '__len__') else 1)
-            poly_idx = row.name  # <-- Get the index from the row itself
-
-            raise ValueError(
-                f"Inconsistent pixel counts across bands for polygon {poly_idx}.\n"
-                f"This usually occurs when bands have different nodata patterns.\n"
-                f"Values per bands for polygon: {poly_idx} : {value_lengths}\n"
-                f"Consider preprocessing your raster to ensure all bands have identical nodata patterns."
-            )
-
-        # All same length - can stack and take mean
-        return np.nanmean(np.stack(coverage_arrays), axis=0)
-
-    mean_coverages = ex_ex_df.apply(_check_coverage_consistency, axis=1)
-
-    metadata = ex_ex_df[include_cols]
-    pixelvalues = ex_ex_df[pixelwise_cols]
-
-    # Pre-allocate lists for efficient construction
-    all_data_rows = []
-
-    # Process each polygon
-    for poly_idx in range(len(ex_ex_df)):
-        # Get pixel values for all bands for this polygon
-        pixel_arrays = [pixelvalues.iloc[poly_idx, j] for j in range(len(pixelwise_cols))]
-
-        # Verify all bands have the same number of pixels
-        pixel_lengths = [len(arr) for arr in pixel_arrays]
-        if len(set(pixel_lengths)) != 1:
+    # This is to catch a inconsistency in the exact_extract output when bands/layers have differing nodata patterns.
+    # If a layer does not have as many valid (non nodata) pixels as the others, it will output fewer values leading
+    # to differing array lengths. This in turn can cause issues when stacking values into a pixelwise df.
+    # Would need a solution in the long term.
+    # We are just trying to catch this before any data is misaligned unintentionally.
+    # Not of importance for standard non composited multi band satellite imagery.
+    coverage_lengths = np.vstack([np.fromiter(map(len, ex_ex_df[c]), dtype=np.int64, count=len(ex_ex_df))
+                                  for c in fraction_cols])
+    inconsistent = (coverage_lengths != coverage_lengths[0]).any(axis=0)
+    if inconsistent.any():
+        row_pos = int(np.argmax(inconsistent))
+        poly_idx = ex_ex_df.index[row_pos]
+        value_lengths = [len(ex_ex_df[c].iloc[row_pos]) for c in pixelwise_cols]
+
+        raise ValueError(
+            f"Inconsistent pixel counts across bands for polygon {poly_idx}.\n"
+            f"This usually occurs when bands have different nodata patterns.\n"
+            f"Values per bands for polygon: {poly_idx} : {value_lengths}\n"
+            f"Consider preprocessing your raster to ensure all bands have identical nodata patterns."
+        )
+
+    # All same length - coverage is normally identical across bands, so take the first band's and only
+    # average over all bands if one of them differs
+    mean_coverages = np.concatenate(ex_ex_df[fraction_cols[0]].values)
+    for c in fraction_cols[1:]:
+        if not np.array_equal(mean_coverages, np.concatenate(ex_ex_df[c].values), equal_nan=True):
+            coverage_flat = [np.concatenate(ex_ex_df[c].values) for c in fraction_cols]
+            mean_coverages = np.nanmean(np.vstack(coverage_flat), axis=0)
+            break
+
+    pixelvalues = [ex_ex_df[c].values for c in pixelwise_cols]  # one object array of pixel arrays per band
+    n_polygons = len(ex_ex_df)
+
+    # Verify all bands have the same number of pixels per polygon
+    pixel_counts = np.fromiter(map(len, pixelvalues[0]), dtype=np.int64, count=n_polygons)
+    for j in range(1, len(pixelvalues)):
+        band_counts = np.fromiter(map(len, pixelvalues[j]), dtype=np.int64, count=n_polygons)
+        if not np.array_equal(band_counts, pixel_counts):
+            poly_idx = int(np.flatnonzero(band_counts != pixel_counts)[0])
+            pixel_lengths = [len(band[poly_idx]) for band in pixelvalues]
             raise ValueError(  # this is a fallback test. should never be called
                 f"Polygon {poly_idx} has inconsistent pixel counts across bands: {pixel_lengths}. "
                 f"This should have been caught earlier."
             )
 
-        n_pixels = pixel_lengths[0]
-
-        # Get metadata for this polygon
-        poly_metadata = metadata.iloc[poly_idx]
-
-        # Get coverage values for this polygon
-        coverage_values = mean_coverages.iloc[poly_idx]
-        if isinstance(coverage_values, (int, float)):
-            coverage_values = [coverage_values]
-
-        # Build rows for all pixels in this polygon
-        for pix_idx in range(n_pixels):
-            row_data = {}  # use dict  to collect data
-
-            # Add metadata columns
-            for col in include_cols:
-                row_data[col] = poly_metadata[col]
-
-            # Add coverage fraction
-            row_data['cover_frac'] = coverage_values[pix_idx]
-
-            # Add pixel ID within polygon
-            row_data['polyPxID'] = pix_idx + 1
-
-            # Add band values
-            for band_idx, band_name in enumerate(bandnames):
-                row_data[band_name] = pixel_arrays[band_idx][pix_idx]
-
-            all_data_rows.append(row_data)
-
-    # Create final dataframe from list of dictionaries
-    final_result = pd.DataFrame(all_data_rows)
-
-    # Reorder columns to have metadata first, then cover_frac, polyPxID, then bands
-    col_order = list(include_cols) + ['cover_frac', 'polyPxID'] + bandnames
-    final_result = final_result[col_order]
+    n_total = int(pixel_counts.sum())
+
+    # Build the output column-wise (one flat array per column) instead of row by row
+    columns = {}
+
+    # Metadata is constant per polygon -> repeat for each of its pixels
+    # (columns are read straight from ex_ex_df rather than copying them into a separate metadata frame)
+    for col in include_cols:
+        poly_values = ex_ex_df[col]
+        if pd.api.types.is_object_dtype(poly_values) or pd.api.types.is_string_dtype(poly_values):
+            # Strings as categorical: only the small integer codes are repeated, not the strings
+            poly_cats = poly_values.astype("category").cat
+            columns[col] = pd.Categorical.from_codes(np.repeat(poly_cats.codes.values, pixel_counts),
+                                                     categories=poly_cats.categories)
+        else:
+            columns[col] = np.repeat(poly_values.values, pixel_counts)
+
+    # Coverage fraction
+    columns['cover_frac'] = mean_coverages
+
+    # Pixel ID within polygon (1-based ramp restarting at each polygon)
+    offsets = np.cumsum(pixel_counts) - pixel_counts
+    poly_px_id = np.arange(n_total) - np.repeat(offsets, pixel_counts) + 1
+    columns['polyPxID'] = poly_px_id.astype(np.int32)  # per-polygon ids comfortably fit int32
+
+    # Band values, written straight into one contiguous pre-allocated (bands x pixels) buffer.
+    # exact_extract widens values (int32 for uint8/uint16/int16, float64 for float32 rasters). Unscaled bands hold
+    # the raster's own values, so casting back to the raster dtype is lossless. exact_extract applies
+    # scale/offset though, so scaled bands are kept as extracted.
+    unscaled = all(scale == 1 for scale in band_scales) and all(offset == 0 for offset in band_offsets)
+    if unscaled:
+        band_dtype = np.result_type(*band_dtypes)
+        casting = "unsafe"
+    else:
+        band_dtype = np.result_type(*(np.asarray(band[0]).dtype for band in pixelvalues))
+        casting = "same_kind"
+    band_flat = np.empty((len(bandnames), n_total), dtype=band_dtype)
+    for band_idx, band in enumerate(pixelvalues):
+        np.concatenate(band, out=band_flat[band_idx], casting=casting)
+
+    # Create final dataframe, metadata first, then cover_frac, polyPxID, then bands.
+    # The bands share one dtype and become a single block backed by band_flat. pd.concat copies by default on
+    # pandas 2; on pandas 3 it is copy-on-write and its copy keyword is deprecated.
+    band_df = pd.DataFrame(band_flat.T, columns=bandnames, copy=False)
+    concat_kwargs = {"copy": False} if int(pd.__version__.split(".")[0]) < 3 else {}
+    final_result = pd.concat([pd.DataFrame(columns, copy=False), band_df], axis=1, **concat_kwargs)
 
     if out_path:
-        final_result.to_csv(out_path, index=False)
+        # Parquet (columnar, compressed) if requested by file extension, otherwise csv
+        if str(out_path).lower().endswith(".parquet"):
+            final_result.to_parquet(out_path, index=False, compression="zstd")
+        else:
+            final_result.to_csv(out_path, index=False)
 
     print(f"Done! Processed {len(ex_ex_df)} polygons into {len(final_result)} pixel rows.")
 